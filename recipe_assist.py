@@ -1,34 +1,153 @@
 import os
+import csv
+from contextlib import contextmanager, closing
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import streamlit as st
-from typing import List, Optional, Dict
-import json
+from typing import List, Optional, Dict, Iterator, Callable
+import orjson
+import re
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from mistralai import Mistral
-import requests
+from mistralai.utils import BackoffStrategy, RetryConfig
+from diskcache import Cache
+import httpx
+
+CHAT_MODEL = "mistral-large-latest"
+# A yes/no classification doesn't need the large model
+CLASSIFIER_MODEL = "mistral-small-latest"
+# Cap user-facing answers; generation time grows linearly with output tokens
+MAX_ANSWER_TOKENS = 512
+# Exact-match cache of direct (non-tool) answers, opened once and shared across
+# reruns and sessions so the temp-dir fallback isn't recreated on every rerun
+@st.cache_resource(show_spinner=False)
+def get_response_cache() -> Cache:
+    """Open the on-disk answer cache, falling back to a temp dir if the cwd isn't writable"""
+    try:
+        return Cache(os.path.join(".cache", "responses"))
+    except (OSError, sqlite3.Error):
+        return Cache()
+
+RESPONSE_CACHE_TTL = 3600
+
+# Optional override to point the Mistral client at a closer regional or proxy endpoint
+MISTRAL_SERVER_URL = os.environ.get("MISTRAL_SERVER_URL")
+
+# Outbound request timeouts in seconds; the read timeout is tunable from the sidebar
+CONNECT_TIMEOUT = 3.05
+DEFAULT_REQUEST_TIMEOUT = 20.0
+
+def mistral_retry_window_ms(request_timeout: float) -> int:
+    """Retry budget for Mistral calls: roughly two timed-out retries plus their backoff"""
+    return int(request_timeout * 2000) + 1500
+
+# CSV file where per-stage latencies are appended for profiling
+LATENCY_LOG = "latency.csv"
+
+# Local food/cooking vocabulary used to classify most messages without an LLM call
+FOOD_WORDS = frozenset("""
+recipe cook cooking cooked bake baking baked roast grill grilled fry fried saute boil
+simmer braise poach marinate marinade knead whisk ferment ingredient meal dish cuisine food snack
+dinner lunch breakfast brunch supper dessert appetizer entree sauce soup stew salad sandwich dough
+oven skillet wok kitchen eat eating hungry vegan vegetarian keto ketogenic paleo gluten dairy
+pescetarian calorie calories protein carb carbs pasta spaghetti noodle noodles rice risotto pizza bread
+pancake waffle omelette omelet taco burrito curry sushi ramen dumpling lasagna casserole cake brownie
+muffin cupcake pudding custard chicken beef pork lamb bacon ham sausage steak burger meatball
+fish salmon tuna shrimp prawn lobster tofu tempeh egg eggs cheese butter cream milk
+yogurt flour sugar chocolate vanilla tomato potato onion garlic ginger carrot spinach broccoli mushroom
+zucchini eggplant cabbage lettuce kale cucumber corn bean beans lentil chickpea pea avocado lemon
+lime banana berry strawberry blueberry mango pineapple coconut peach almond peanut walnut cashew oat
+oats quinoa couscous barley herb basil oregano thyme rosemary cilantro parsley cumin paprika cinnamon
+spicy savory savoury vinaigrette dressing gravy pesto salsa hummus guacamole smoothie juice cocktail beverage
+drink tea coffee wine beer broth leftover leftovers nutrition nutritious cajun
+""".split())
+FOOD_PATTERN = re.compile(r"\b(" + "|".join(sorted(FOOD_WORDS)) + r")(s|es)?\b", re.I)
+# Messages up to this length with no food words are treated as chit-chat
+SHORT_MESSAGE_LENGTH = 40
 
 class RecipeAssistant:
-    def __init__(self, mistral_api_key: str, spoonacular_api_key: str):
-        self.mistral_client = Mistral(api_key=mistral_api_key)
+    # Route recipe queries via tool calls in a single request; set to False for
+    # providers without tool routing to fall back to keyword_gate and the LLM classifier
+    tool_routing = True
+
+    def __init__(self, mistral_api_key: str, spoonacular_api_key: str,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        # Bound every call so a slow upstream can't stall the Streamlit worker
+        self.mistral_client = Mistral(
+            api_key=mistral_api_key,
+            server_url=MISTRAL_SERVER_URL,
+            timeout_ms=int(request_timeout * 1000),
+            retry_config=RetryConfig("backoff", BackoffStrategy(500, 4000, 2.0, mistral_retry_window_ms(request_timeout)), True)
+        )
         self.spoonacular_api_key = spoonacular_api_key
         self.base_url = "https://api.spoonacular.com/recipes/complexSearch"
+        # Keep-alive HTTP/2 client so repeated Spoonacular calls share one connection
+        self.http_client = httpx.Client(
+            timeout=httpx.Timeout(request_timeout, connect=CONNECT_TIMEOUT),
+            transport=httpx.HTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+                retries=2
+            )
+        )
     
-    def chat(self, message: str) -> str:
+    def chat(self, message: str) -> Iterator[str]:
         """Handle regular conversation"""
-        response = self.mistral_client.chat.complete(
-            model="mistral-large-latest",
-            messages=[{"role": "user", "content": message}]
+        messages = [{"role": "user", "content": message}]
+        key = cache_key("chat", CHAT_MODEL, messages)
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return iter([cached])
+        stream = self.mistral_client.chat.stream(
+            model=CHAT_MODEL,
+            messages=messages,
+            max_tokens=MAX_ANSWER_TOKENS
         )
-        return response.choices[0].message.content
+        return cache_stream(stream_text(stream), key)
 
-    def is_recipe_query(self, message: str) -> bool:
-        """Check if the message is recipe-related"""
-        prompt = f"""Determine if this message is asking about recipes, cooking, food, or ingredients. 
-        Respond with just 'true' or 'false': {message}"""
-        
-        response = self.mistral_client.chat.complete(
-            model="mistral-large-latest",
-            messages=[{"role": "user", "content": prompt}]
+    def route(self, messages: List[Dict]):
+        """Ask the model to either answer directly or call a recipe tool.
+
+        Returns ``(tool_calls, None)`` when the model picked a tool, otherwise
+        ``(None, stream)`` where ``stream`` yields the direct answer.
+        """
+        key = cache_key("route", CHAT_MODEL, messages)
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return None, iter([cached])
+        stream = self.mistral_client.chat.stream(
+            model=CHAT_MODEL,
+            messages=messages,
+            max_tokens=MAX_ANSWER_TOKENS,
+            tools=tools,
+            tool_choice="auto"
         )
-        return response.choices[0].message.content.lower().strip() == "true"
+        for event in stream:
+            choice = event.data.choices[0]
+            if choice.delta.tool_calls:
+                with stream:
+                    return collect_tool_calls(choice, stream), None
+            if choice.delta.content:
+                # The open stream is handed to the caller and closed once consumed
+                return None, cache_stream(routed_text(stream, choice.delta.content), key)
+        stream.response.close()
+        return None, iter(())
+
+    def keyword_gate(self, message: str) -> Optional[bool]:
+        """Classify a message locally; ``None`` means it needs the LLM classifier"""
+        if FOOD_PATTERN.search(message):
+            return True
+        if len(message) <= SHORT_MESSAGE_LENGTH:
+            return False
+        return None
+
+    def warm_up(self):
+        """Open the Spoonacular and Mistral connections ahead of the first message"""
+        self.http_client.head("https://api.spoonacular.com/", timeout=3)
+        self.mistral_client.models.list()
 
     def search_recipes(self, 
                       ingredients: Optional[List[str]] = None,
@@ -39,11 +158,12 @@ class RecipeAssistant:
                       max_ready_time: Optional[int] = None,
                       min_protein: Optional[int] = None,
                       max_calories: Optional[int] = None,
-                      sort: Optional[str] = None) -> Dict:
+                      sort: Optional[str] = None,
+                      fill_ingredients: bool = False) -> Dict:
+        # Ingredient lists make up most of the payload and the cards don't show them
         params = {
-            'apiKey': self.spoonacular_api_key,
             'addRecipeInformation': True,
-            'fillIngredients': True,
+            'fillIngredients': fill_ingredients,
             'number': 5
         }
         
@@ -66,14 +186,147 @@ class RecipeAssistant:
         if sort:
             params['sort'] = sort
             
-        response = requests.get(self.base_url, params=params)
-        return response.json()
+        return search_recipes_cached(self.http_client, self.base_url, tuple(sorted(params.items())),
+                                     self.spoonacular_api_key)
 
     def get_recipe_details(self, recipe_id: int) -> Dict:
         url = f"https://api.spoonacular.com/recipes/{recipe_id}/information"
-        params = {'apiKey': self.spoonacular_api_key}
-        response = requests.get(url, params=params)
-        return response.json()
+        return recipe_details_cached(self.http_client, url, self.spoonacular_api_key)
+
+# Transient Spoonacular statuses worth retrying with exponential backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+SPOONACULAR_RETRIES = 2
+# Longer Retry-After waits fail fast rather than stalling the Streamlit worker
+MAX_RETRY_AFTER = 10
+
+def retry_delay(response: httpx.Response, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying, honouring Retry-After; None means don't retry"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return 0.3 * 2 ** attempt
+    try:
+        delay = float(retry_after)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return 0.3 * 2 ** attempt
+    return max(delay, 0) if delay <= MAX_RETRY_AFTER else None
+
+def spoonacular_get(client: httpx.Client, url: str, params: Dict, api_key: str) -> Dict:
+    """GET a Spoonacular endpoint, raising on errors so they are never cached.
+
+    The key goes in the ``x-api-key`` header rather than the query string, so
+    it never appears in the URL quoted by ``HTTPStatusError`` messages.
+    """
+    for attempt in range(SPOONACULAR_RETRIES + 1):
+        response = client.get(url, params=params, headers={'x-api-key': api_key})
+        if response.status_code not in RETRY_STATUSES or attempt == SPOONACULAR_RETRIES:
+            break
+        delay = retry_delay(response, attempt)
+        if delay is None:
+            break
+        time.sleep(delay)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+# Spoonacular results are stable for hours, so identical searches skip the
+# HTTP round trip and JSON parse. The client is excluded from the cache key.
+@st.cache_data(ttl=1800, max_entries=512, show_spinner=False)
+def search_recipes_cached(_client: httpx.Client, url: str, params: tuple, api_key: str) -> Dict:
+    return spoonacular_get(_client, url, dict(params), api_key)
+
+@st.cache_data(ttl=86400, max_entries=512, show_spinner=False)
+def recipe_details_cached(_client: httpx.Client, url: str, api_key: str) -> Dict:
+    return spoonacular_get(_client, url, {}, api_key)
+
+@st.cache_data(ttl=3600, max_entries=2048, show_spinner=False)
+def classify_with_llm(_mistral_client: Mistral, message: str) -> bool:
+    """Ask the model whether a message is recipe-related, cached per message"""
+    prompt = f"""Determine if this message is asking about recipes, cooking, food, or ingredients. 
+    Respond with just 'true' or 'false': {message}"""
+    
+    response = _mistral_client.chat.complete(
+        model=CLASSIFIER_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=2,
+        temperature=0,
+        random_seed=0
+    )
+    return response.choices[0].message.content.lower().strip() == "true"
+
+def stream_text(stream) -> Iterator[str]:
+    """Yield the text deltas of a Mistral chat stream"""
+    with stream:
+        for event in stream:
+            yield event.data.choices[0].delta.content or ""
+
+def routed_text(stream, first: str) -> Iterator[str]:
+    """Continue a routed stream whose first delta was text.
+
+    The routing prompt asks the model to either answer or call a tool. A tool
+    call arriving after the answer has started can't be acted on, so it is
+    surfaced as an error instead of being dropped.
+    """
+    with stream:
+        yield first
+        for event in stream:
+            delta = event.data.choices[0].delta
+            if delta.tool_calls:
+                raise RuntimeError("the model requested a recipe search after starting its answer")
+            yield delta.content or ""
+
+def collect_tool_calls(choice, stream) -> List:
+    """Merge streamed tool-call deltas until the model finishes its turn"""
+    calls = {}
+    while True:
+        for call in choice.delta.tool_calls or []:
+            index = call.index if call.index is not None else len(calls)
+            merged = calls.get(index)
+            if merged is None:
+                calls[index] = call
+            elif isinstance(merged.function.arguments, str) and isinstance(call.function.arguments, str):
+                merged.function.arguments += call.function.arguments
+        if choice.finish_reason is not None:
+            break
+        event = next(stream, None)
+        if event is None:
+            break
+        choice = event.data.choices[0]
+    return [calls[index] for index in sorted(calls)]
+
+def cache_key(kind: str, model: str, messages: List[Dict]) -> str:
+    """Key a cached answer by call kind (tools or not), model and messages"""
+    return hashlib.sha256(orjson.dumps([kind, model, messages])).hexdigest()
+
+def cache_stream(chunks: Iterator[str], key: str) -> Iterator[str]:
+    """Pass chunks through and cache the full text once the stream completes"""
+    parts = []
+    with closing(chunks):
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    get_response_cache().set(key, "".join(parts), expire=RESPONSE_CACHE_TTL)
+
+def discard_answer(answer: Optional[Iterator[str]]):
+    """Release the stream behind an answer that will never be consumed.
+
+    Closing an unstarted generator skips its body, so the routed answer is
+    advanced to its first (already received) chunk to enter ``with stream:``
+    before closing it.
+    """
+    if hasattr(answer, "close"):
+        next(answer, None)
+        answer.close()
+
+@st.cache_resource(show_spinner=False)
+def get_executor() -> ThreadPoolExecutor:
+    """Worker pool for overlapping independent outbound calls, shared across reruns"""
+    return ThreadPoolExecutor(max_workers=4)
+
+ROUTING_PROMPT = """You are a friendly assistant who specializes in recipes and cooking.
+If the user asks about recipes, cooking, food, or ingredients, call the search_recipes tool.
+Otherwise, answer the message directly."""
 
 # Function specifications for Mistral
 tools = [
@@ -141,52 +394,176 @@ tools = [
     }
 ]
 
-def process_message(message: str, assistant: RecipeAssistant):
-    """Process user message and determine whether to chat or search recipes"""
+# Bounded so changing keys or the timeout doesn't grow the cache without limit.
+# Evicted assistants aren't closed explicitly; their clients are released on GC.
+@st.cache_resource(max_entries=4)
+def get_assistant(mistral_api_key: str, spoonacular_api_key: str,
+                  request_timeout: float = DEFAULT_REQUEST_TIMEOUT) -> RecipeAssistant:
+    """Build the assistant once per configuration and reuse it across reruns"""
+    assistant = RecipeAssistant(mistral_api_key, spoonacular_api_key, request_timeout)
+    # Pay DNS + TLS setup in the background; failures just mean a cold first request
+    get_executor().submit(assistant.warm_up)
+    return assistant
+
+def compact_results(results: Dict) -> List[Dict]:
+    """Keep only the fields the final summary needs, to cut prompt tokens"""
+    compact = []
+    for recipe in results.get('results', []):
+        item = {
+            "title": recipe.get('title'),
+            "ready_in_minutes": recipe.get('readyInMinutes'),
+            "servings": recipe.get('servings'),
+            "url": recipe.get('sourceUrl')
+        }
+        if recipe.get('extendedIngredients'):
+            item["ingredients"] = [ingredient['name'] for ingredient in recipe['extendedIngredients']]
+        compact.append(item)
+    return compact
+
+@contextmanager
+def timed(name: str, stages: Dict[str, float]):
+    """Record the wall-clock duration of the enclosed block under ``name``"""
+    start = time.perf_counter()
     try:
-        # First, check if it's a recipe query
-        is_recipe = assistant.is_recipe_query(message)
-        
-        if is_recipe:
-            # Process as recipe query
+        yield
+    finally:
+        stages[name] = time.perf_counter() - start
+
+def log_latency(stages: Dict[str, float]):
+    """Append per-stage latencies to the CSV log for regression tracking.
+
+    Logging is best-effort: an unwritable log never fails the chat turn.
+    """
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    try:
+        with open(LATENCY_LOG, "a", newline="") as f:
+            writer = csv.writer(f)
+            for name, seconds in stages.items():
+                writer.writerow([timestamp, name, f"{seconds * 1000:.0f}"])
+    except OSError:
+        pass
+
+def render_latency(stages: Dict[str, float]):
+    """Show per-stage latencies for one assistant turn"""
+    with st.expander("⏱ Latency"):
+        st.caption(" | ".join(f"{name}: {seconds * 1000:.0f}ms" for name, seconds in stages.items()))
+
+def process_message(message: str, assistant: RecipeAssistant,
+                    report_stage: Callable[[str], None] = lambda label: None):
+    """Process user message and determine whether to chat or search recipes.
+
+    Returns ``(response, results, is_recipe, stages)`` where ``stages`` maps
+    each outbound call to its latency in seconds.
+    """
+    stages = {}
+    try:
+        report_stage("Understanding your message...")
+        if assistant.tool_routing:
+            # Let the model route in a single call: tool call for recipes, plain answer otherwise
+            messages = [
+                {"role": "system", "content": ROUTING_PROMPT},
+                {"role": "user", "content": message}
+            ]
+            with timed("route", stages):
+                tool_calls, answer = assistant.route(messages)
+        else:
+            # Fallback for providers without tool routing: the keyword gate
+            # settles most messages locally before any request is made
             messages = [{"role": "user", "content": message}]
-            
-            response = assistant.mistral_client.chat.complete(
-                model="mistral-large-latest",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto"
-            )
-            
-            tool_call = response.choices[0].message.tool_calls[0]
-            function_args = json.loads(tool_call.function.arguments)
-            
+            is_recipe = assistant.keyword_gate(message)
+            if is_recipe is False:
+                with timed("chat", stages):
+                    answer = assistant.chat(message)
+                return answer, None, False, stages
+            if is_recipe is None:
+                # Ambiguous: run the LLM classifier while the tool call is
+                # already in flight, so the two waits overlap
+                executor = get_executor()
+                with timed("classify", stages):
+                    future_is_recipe = executor.submit(classify_with_llm, assistant.mistral_client,
+                                                       message.lower().strip())
+                    future_response = executor.submit(assistant.route, messages)
+                    try:
+                        is_recipe = future_is_recipe.result()
+                    except Exception:
+                        # Don't leave the in-flight routed stream holding a connection
+                        if future_response.exception() is None:
+                            discard_answer(future_response.result()[1])
+                        raise
+                with timed("route", stages):
+                    tool_calls, answer = future_response.result()
+                if not is_recipe:
+                    # Reuse the routed answer rather than asking the model again
+                    if answer is None:
+                        with timed("chat", stages):
+                            answer = assistant.chat(message)
+                    return answer, None, False, stages
+            else:
+                with timed("route", stages):
+                    tool_calls, answer = assistant.route(messages)
+
+        if not tool_calls:
+            # Process as regular chat
+            return answer, None, False, stages
+
+        # Process as recipe query
+        tool_call = tool_calls[0]
+        function_args = orjson.loads(tool_call.function.arguments)
+        
+        report_stage("Searching recipes...")
+        with timed("search", stages):
             results = assistant.search_recipes(**function_args)
-            
-            messages.extend([
-                response.choices[0].message,
-                {
-                    "role": "tool",
-                    "name": tool_call.function.name,
-                    "content": json.dumps(results),
-                    "tool_call_id": tool_call.id
-                }
-            ])
-            
-            final_response = assistant.mistral_client.chat.complete(
-                model="mistral-large-latest",
-                messages=messages
+        
+        messages.extend([
+            {"role": "assistant", "content": "", "tool_calls": tool_calls},
+            {
+                "role": "tool",
+                "name": tool_call.function.name,
+                "content": orjson.dumps(compact_results(results)).decode(),
+                "tool_call_id": tool_call.id
+            }
+        ])
+        
+        report_stage("Composing answer...")
+        with timed("summary", stages):
+            final_stream = assistant.mistral_client.chat.stream(
+                model=CHAT_MODEL,
+                messages=messages,
+                max_tokens=MAX_ANSWER_TOKENS
             )
-            
-            return final_response.choices[0].message.content, results, True
-        else:
-            # Process as regular chat
-            chat_response = assistant.chat(message)
-            return chat_response, None, False
+        
+        return stream_text(final_stream), results, True, stages
             
     except Exception as e:
         raise Exception(f"Error processing message: {str(e)}")
 
+def render_recipes(results: Optional[Dict]):
+    """Render recipe cards for a Spoonacular search result.
+
+    Searches request ``addRecipeInformation``, so every field shown here is
+    already in the search response and no per-recipe detail fetch is needed.
+    """
+    if results and 'results' in results and results['results']:
+        st.subheader("📋 Found Recipes:")
+        cols = st.columns(len(results['results']))
+        for idx, recipe in enumerate(results['results']):
+            with cols[idx]:
+                # st.image(recipe['image'], use_column_width=True)
+                st.markdown(f"**{recipe['title']}**")
+                st.write(f"Ready in: {recipe['readyInMinutes']} minutes")
+                st.write(f"Servings: {recipe['servings']}")
+                st.write(f"[View Recipe]({recipe['sourceUrl']})")
+
+def render_history(messages: List[Dict]):
+    """Render previous chat turns"""
+    for message in messages:
+        with st.chat_message(message["role"]):
+            st.write(message["content"])
+            if "results" in message:
+                render_recipes(message["results"])
+            if "stages" in message:
+                render_latency(message["stages"])
+
 def main():
     st.set_page_config(page_title="AI Recipe Assistant", layout="wide")
     
@@ -197,32 +574,22 @@ def main():
     st.sidebar.title("Configuration")
     mistral_api_key = st.sidebar.text_input("Mistral API Key", type="password")
     spoonacular_api_key = st.sidebar.text_input("Spoonacular API Key", type="password")
+    request_timeout = st.sidebar.slider("Request timeout (seconds)", min_value=5.0, max_value=120.0,
+                                        value=DEFAULT_REQUEST_TIMEOUT, step=5.0)
+
+    # Reuse the same assistant (and its connection pools) across reruns
+    assistant = get_assistant(mistral_api_key, spoonacular_api_key, request_timeout) if mistral_api_key else None
 
     # Initialize session state for storing conversation history
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
     # Display chat history
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.write(message["content"])
-            if "results" in message:
-                # Display recipe results
-                results = message["results"]
-                if results and 'results' in results and results['results']:
-                    st.subheader("📋 Found Recipes:")
-                    cols = st.columns(len(results['results']))
-                    for idx, recipe in enumerate(results['results']):
-                        with cols[idx]:
-                            # st.image(recipe['image'], use_column_width=True)
-                            st.write(f"**{recipe['title']}**")
-                            st.write(f"Ready in: {recipe['readyInMinutes']} minutes")
-                            st.write(f"Servings: {recipe['servings']}")
-                            st.write(f"[View Recipe]({recipe['sourceUrl']})")
+    render_history(st.session_state.messages)
 
     # Chat input
     if prompt := st.chat_input("Chat with me or ask about recipes!"):
-        if not mistral_api_key:
+        if assistant is None:
             st.error("Please enter your Mistral API key in the sidebar to continue.")
             return
 
@@ -233,31 +600,29 @@ def main():
 
         # Process the message
         try:
-            assistant = RecipeAssistant(mistral_api_key, spoonacular_api_key)
             with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    response, results, is_recipe = process_message(prompt, assistant)
-                    
-                    # Display response
-                    st.write(response)
-                    
-                    # If it's a recipe query and we have results, display them
-                    if is_recipe and results and 'results' in results and results['results']:
-                        st.subheader("📋 Found Recipes:")
-                        cols = st.columns(len(results['results']))
-                        for idx, recipe in enumerate(results['results']):
-                            with cols[idx]:
-                                # st.image(recipe['image'], use_column_width=True)
-                                st.markdown(f"**{recipe['title']}**")
-                                st.write(f"Ready in: {recipe['readyInMinutes']} minutes")
-                                st.write(f"Servings: {recipe['servings']}")
-                                st.write(f"[View Recipe]({recipe['sourceUrl']})")
+                with st.status("Thinking...", expanded=False) as status:
+                    response, results, is_recipe, stages = process_message(
+                        prompt, assistant, lambda label: status.update(label=label)
+                    )
+                    status.update(label="Done", state="complete")
+
+                # Stream the response as it is generated
+                with timed("stream", stages):
+                    response = st.write_stream(response)
+
+                # If it's a recipe query and we have results, display them
+                if is_recipe:
+                    render_recipes(results)
+
+                render_latency(stages)
 
             # Add assistant response to chat history
-            response_message = {"role": "assistant", "content": response}
+            response_message = {"role": "assistant", "content": response, "stages": stages}
             if is_recipe and results:
                 response_message["results"] = results
             st.session_state.messages.append(response_message)
+            log_latency(stages)
 
         except Exception as e:
             st.error(f"An error occurred: {str(e)}")